@@ -1,210 +1,332 @@
-import json
+import codecs
+import io
 import re
+import threading
+import time
 from datetime import datetime
-from typing import Any, Dict, List, Tuple, Optional
+from typing import Any, Dict, Iterator, List, Tuple, Optional
+import numpy as np
+import orjson
 import pandas as pd
-import requests
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import httpx
 import streamlit as st
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+from lxml import etree
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from urllib.parse import urlparse
 
 st.set_page_config(page_title="Sara vigila tu Schema", layout="wide")
 
 # --- CONFIGURACIÓN INTERNA ---
-MAX_THREADS = 15  # Procesamiento rápido interno
+MAX_THREADS = 15  # Procesamiento rápido interno (valor por defecto del slider)
+PROGRESS_INTERVAL = 0.25  # Segundos entre refrescos de la barra de progreso
+PROGRESS_STEPS = 100  # Repintados máximos de la barra por corrida
+MAX_HTML_BYTES = 1_000_000  # El JSON-LD suele estar en <head>: no bajamos páginas enteras de varios MB
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+# Cliente compartido entre hilos, URLs y reruns de Streamlit. Con HTTP/2 las URLs del mismo host
+# se multiplexan sobre una sola conexión TLS; los hosts sin HTTP/2 usan keep-alive de HTTP/1.1.
+@st.cache_resource
+def get_client() -> httpx.Client:
+    limits = httpx.Limits(max_connections=64, max_keepalive_connections=32)
+    transport = httpx.HTTPTransport(http2=True, limits=limits, retries=2)
+    return httpx.Client(transport=transport, headers={"User-Agent": USER_AGENT}, follow_redirects=True)
+
+CLIENT = get_client()
+
+# Solo necesitamos el contenido de <script type="application/ld+json">: evitamos armar el DOM completo.
+# Patrón en bytes: se aplica sobre el cuerpo crudo y solo se decodifica lo que matchea.
+JSONLD_SCRIPT_RE = re.compile(rb'<script\b[^>]*\stype\s*=\s*["\']?application/ld\+json[^>]*>(.*?)</script\s*>', re.I | re.S)
+LDJSON_TYPE_RE = re.compile(r"application/ld\+json", re.I)
+JSONLD_STRAINER = SoupStrainer("script", attrs={"type": LDJSON_TYPE_RE})
+ISO_DATETIME_RE = re.compile(r'\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}')
+CHARSET_RE = re.compile(rb'charset\s*=\s*["\']?([\w.:-]+)', re.I)
+META_CHARSET_RE = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?([\w.:-]+)', re.I)
+ARTICLE_TYPE_RE = re.compile(rb'"(?:NewsArticle|Article|BlogPosting|LiveBlogPosting)"')
+
+# Estado de parser por hilo: un parser de lxml no se comparte entre hilos, pero sí se reutiliza entre páginas
+_thread_state = threading.local()
 
 # --- FUNCIONES DE EXTRACCIÓN ---
 
-def fetch_html(url: str, timeout: int = 15) -> Tuple[Optional[str], Optional[int], Optional[str], Dict[str, str]]:
-    headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"}
-    meta_tags = {}
+def resolve_encoding(content_type: str, raw: bytes) -> str:
+    # charset del header; si no viene, el <meta charset> del inicio del documento; si no, UTF-8.
+    # (asumir ISO-8859-1 para text/html sin charset rompe acentos en páginas UTF-8)
+    match = CHARSET_RE.search(content_type.encode("latin-1", errors="ignore")) or META_CHARSET_RE.search(raw[:4096])
+    encoding = match.group(1).decode("ascii") if match else "utf-8"
     try:
-        r = requests.get(url, headers=headers, timeout=timeout, allow_redirects=True)
-        soup = BeautifulSoup(r.text, "html.parser")
-        og_img = soup.find("meta", property="og:image")
-        if og_img: meta_tags["og_image"] = og_img.get("content", "")
-        return r.text, r.status_code, None, meta_tags
-    except Exception as e:
-        return None, None, str(e), {}
+        codecs.lookup(encoding)
+    except LookupError:
+        encoding = "utf-8"
+    return encoding
 
-def parse_jsonld_from_html(html: str) -> Tuple[List[Any], List[str]]:
-    soup = BeautifulSoup(html, "html.parser")
-    scripts = soup.find_all("script", attrs={"type": re.compile(r"application/ld\+json", re.I)})
+def fetch_html(url: str, timeout: int = 15) -> Tuple[Optional[bytes], Optional[int], Optional[str], Dict[str, str], str]:
+    try:
+        with CLIENT.stream("GET", url, timeout=timeout) as r:
+            chunks, total = [], 0
+            for chunk in r.iter_bytes(64 * 1024):
+                chunks.append(chunk)
+                total += len(chunk)
+                if total >= MAX_HTML_BYTES: break
+        raw = b"".join(chunks)
+        encoding = resolve_encoding(r.headers.get("Content-Type", ""), raw)
+        return raw, r.status_code, None, extract_meta_tags(raw, encoding), encoding
+    except Exception as e:
+        return None, None, str(e), {}, "utf-8"
+
+def _html_parser(encoding: str) -> etree.HTMLParser:
+    parsers = getattr(_thread_state, "html_parsers", None)
+    if parsers is None:
+        parsers = _thread_state.html_parsers = {}
+    parser = parsers.get(encoding)
+    if parser is None:
+        parser = parsers[encoding] = etree.HTMLParser(encoding=encoding, remove_comments=True, no_network=True)
+    return parser
+
+def extract_meta_tags(html: bytes, encoding: str) -> Dict[str, str]:
+    meta_tags = {}
+    try:
+        try:
+            parser = _html_parser(encoding)
+        except LookupError:  # encoding válido para Python pero desconocido para libxml2
+            parser = _html_parser("utf-8")
+        root = etree.fromstring(html, parser)
+    except etree.LxmlError:
+        return meta_tags
+    if root is None: return meta_tags
+    og_img = root.find('.//meta[@property="og:image"]')
+    if og_img is not None: meta_tags["og_image"] = og_img.get("content", "")
+    return meta_tags
+
+def _jsonld_scripts_with_soup(html: bytes, encoding: str) -> List[str]:
+    # Respaldo lento para marcado raro que la regex no reconoce
+    soup = BeautifulSoup(html, "lxml", parse_only=JSONLD_STRAINER, from_encoding=encoding)
+    scripts = soup.find_all("script")
+    return [s.string or s.get_text() or "" for s in scripts]
+
+def _iter_jsonld_raw(html: bytes, encoding: str) -> Iterator[bytes]:
+    # Generador: si el escaneo rápido corta, el regex deja de recorrer el resto del HTML
+    # orjson lee bytes UTF-8 directamente: solo re-codificamos bloques de páginas en otro encoding
+    is_utf8 = codecs.lookup(encoding).name == "utf-8"
+    found = False
+    for m in JSONLD_SCRIPT_RE.finditer(html):
+        found = True
+        yield m.group(1) if is_utf8 else m.group(1).decode(encoding, errors="replace").encode("utf-8")
+    if not found and b"ld+json" in html.lower():
+        for s in _jsonld_scripts_with_soup(html, encoding): yield s.encode("utf-8")
+
+def parse_jsonld_from_html(html: bytes, encoding: str = "utf-8", full_scan: bool = True) -> Tuple[List[Any], List[str]]:
     blocks, errors = [], []
-    for i, s in enumerate(scripts, start=1):
-        raw = (s.string or s.get_text() or "").strip()
+    for i, raw in enumerate(_iter_jsonld_raw(html, encoding), start=1):
+        raw = raw.strip()
         if not raw: continue
         try:
-            blocks.append(json.loads(raw))
+            try:
+                blocks.append(orjson.loads(raw))
+            except orjson.JSONDecodeError:
+                # Un solo reintento desde str, solo si ayuda: bytes UTF-8 inválidos, o espacios Unicode
+                # (p. ej. U+00A0) alrededor del bloque que bytes.strip() no quita. Un JSON mal formado falla una sola vez.
+                try:
+                    text = raw.decode("utf-8")
+                    if text.strip() == text: raise
+                except UnicodeDecodeError:
+                    text = raw.decode("utf-8", errors="replace")
+                text = text.strip()
+                if not text: continue
+                blocks.append(orjson.loads(text))
+            # Escaneo rápido: el primer bloque con el artículo/LiveBlog suele traer todo lo necesario
+            if not full_scan and ARTICLE_TYPE_RE.search(raw): break
         except Exception as e:
             errors.append(f"Bloque {i}: {e}")
     return blocks, errors
 
+def _has_iso_prefix(s: str) -> bool:
+    # 'YYYY-MM-DDTHH:MM:SS' al inicio: comparación por posición, sin regex
+    return (len(s) >= 19 and s[4] == s[7] == "-" and s[10] == "T" and s[13] == s[16] == ":"
+            and (s[0:4] + s[5:7] + s[8:10] + s[11:13] + s[14:16] + s[17:19]).isdecimal())
+
 def parse_date(date_str: Any) -> Optional[str]:
     if not date_str or not isinstance(date_str, str): return None
+    if _has_iso_prefix(date_str): return date_str[:10] + " " + date_str[11:19]
     try:
-        match = re.search(r'\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}', date_str)
+        match = ISO_DATETIME_RE.search(date_str)
         if match: return match.group(0).replace("T", " ")
         return date_str
     except: return str(date_str)
 
-def analyze_multimedia(blocks: List[Any], meta_tags: Dict[str, str]) -> Dict[str, str]:
-    res = {
-        "primaryImageOfPage": "❌", 
-        "mainEntityImage": "❌", 
-        "ogImage": str(meta_tags.get("og_image", "❌")), 
-        "url_video": "❌ No detectado"
-    }
-    video_sources = [] 
-    main_images = []
-    seen_nodes = set()
+def parse_iso_datetime(date_str: Any) -> Optional[datetime]:
+    if not isinstance(date_str, str): return None
+    try:
+        if _has_iso_prefix(date_str):
+            s = date_str
+        else:
+            match = ISO_DATETIME_RE.search(date_str)
+            if not match: return None
+            s = match.group(0)
+        return datetime(int(s[0:4]), int(s[5:7]), int(s[8:10]), int(s[11:13]), int(s[14:16]), int(s[17:19]))
+    except ValueError: return None
+
+def liveblog_frequency(update_dates: List[str]) -> float:
+    freq = 0
+    p_up = [d for d in map(parse_iso_datetime, update_dates) if d]
+    if len(p_up) > 1:
+        # El promedio de los deltas consecutivos es (máx - mín) / (n - 1): no hace falta ordenar
+        freq = round((max(p_up) - min(p_up)).total_seconds() / 60 / (len(p_up) - 1), 1)
+    return freq
+
+def analyze_blocks(blocks: List[Any], current_url: str, meta_tags: Dict[str, str]) -> Dict[str, Any]:
+    # Un solo recorrido del JSON-LD: tipos, autor, fechas, LiveBlog y multimedia
+    # Dicts como conjuntos ordenados: deduplican al insertar y conservan el orden de aparición
+    mains, subs, seen_nodes = {}, {}, set()
+    has_auth, auth_name = False, "No identificado"
+    update_dates = []
+    created_date, last_modified = None, None
+    fallback_created, fallback_modified = None, None
+    primary_image = None
+    main_images, video_sources = {}, {}
+    site_domain_name = ""
+    try:
+        domain = urlparse(current_url).netloc
+        site_domain_name = domain.split('.')[-2].lower()
+    except: pass
 
     def get_url(val):
         if isinstance(val, dict): return val.get("url") or val.get("contentUrl") or val.get("embedUrl")
         return val if isinstance(val, str) else None
 
-    def walk(node: Any):
-        if id(node) in seen_nodes: return
-        seen_nodes.add(id(node))
-        if isinstance(node, dict):
+    def get_auth_info(data):
+        # Primer autor de listas (posiblemente anidadas), sin recursión
+        while isinstance(data, list) and len(data) > 0: data = data[0]
+        if isinstance(data, dict): return data.get("name"), data.get("@type")
+        return None, None
+
+    # Recorrido iterativo con pila (mismo orden que el DFS recursivo, sin límite de recursión).
+    # Nombres locales para evitar búsquedas globales en el bucle caliente.
+    _is, _dict, _list, _str = isinstance, dict, list, str
+    _containers = (dict, list)
+    stack = [(b, True) for b in reversed(blocks)]
+    stack_pop, stack_extend = stack.pop, stack.extend
+    seen_add = seen_nodes.add
+    while stack:
+        node, is_root = stack_pop()
+        if id(node) in seen_nodes: continue
+        seen_add(id(node))
+        if _is(node, _dict):
+            get = node.get
+            t = get("@type")
+            if not t: curr = ()
+            else: curr = (t,) if _is(t, _str) else tuple(map(_str, t)) if _is(t, _list) else (_str(t),)
+
+            # Tipos jerárquicos y autor
+            found_types = mains if is_root else subs
+            for x in curr: found_types[x] = None
+            if any(at in curr for at in ("Article", "NewsArticle", "BlogPosting", "LiveBlogPosting")):
+                if "author" in node and node["author"]:
+                    name, a_type = get_auth_info(node["author"])
+                    if name:
+                        # Texto siempre: "name" puede ser lista, dict u otro valor JSON y la columna va a Arrow
+                        auth_name = str(name)
+                        name_lower = auth_name.lower()
+                        is_person = (a_type == "Person")
+                        is_not_site_name = site_domain_name not in name_lower if site_domain_name else True
+                        has_auth = True if (is_person and is_not_site_name) else False
+
+            # Fechas y LiveBlog
+            if not fallback_created and get("datePublished"):
+                fallback_created = get("datePublished")
+            if not fallback_modified and get("dateModified"):
+                fallback_modified = get("dateModified")
+            if any("LiveBlogPosting" in x for x in curr):
+                created_date = get("datePublished")
+                last_modified = get("dateModified")
+                updates = get("liveBlogUpdate", [])
+                if _is(updates, _dict): updates = [updates]
+                for up in updates:
+                    if _is(up, _dict):
+                        d = up.get("datePublished") or up.get("dateModified")
+                        if d: update_dates.append(d)
+
+            # Multimedia
             if "primaryImageOfPage" in node:
                 u = get_url(node["primaryImageOfPage"])
-                if u: res["primaryImageOfPage"] = str(u)
-            
-            t = str(node.get("@type", ""))
-            if any(at in t for at in ["Article", "NewsArticle", "BlogPosting"]):
-                img_data = node.get("image")
+                if u: primary_image = str(u)
+            if any("Article" in x or "BlogPosting" in x for x in curr):
+                img_data = get("image")
                 if img_data:
-                    if isinstance(img_data, list):
+                    if _is(img_data, _list):
                         for item in img_data:
                             u_img = get_url(item)
-                            if u_img: main_images.append(str(u_img))
+                            if u_img: main_images[str(u_img)] = None
                     else:
                         u_img = get_url(img_data)
-                        if u_img: main_images.append(str(u_img))
-            
-            if "VideoObject" in t:
-                u_v = node.get("contentUrl") or node.get("embedUrl") or node.get("url")
+                        if u_img: main_images[str(u_img)] = None
+            if any("VideoObject" in x for x in curr):
+                u_v = get("contentUrl") or get("embedUrl") or get("url")
                 if u_v:
                     u_v_str = str(u_v).lower()
                     if "youtube.com" in u_v_str or "youtu.be" in u_v_str:
-                        video_sources.append(f"YouTube ✅ ({u_v})")
+                        video_sources[f"YouTube ✅ ({u_v})"] = None
                     else:
-                        video_sources.append(f"Propio/Otro 🎥 ({u_v})")
-            
-            for v in node.values(): walk(v)
-        elif isinstance(node, list):
-            for it in node: walk(it)
-
-    for b in blocks: walk(b)
-    if main_images:
-        res["mainEntityImage"] = "\n".join(list(dict.fromkeys(main_images)))
-    if video_sources:
-        res["url_video"] = "\n".join(list(dict.fromkeys(video_sources)))
-    return res
-
-def analyze_liveblog(blocks: List[Any]) -> Dict[str, Any]:
-    update_dates, seen_nodes = [], set()
-    created_date, last_modified = None, None
-    fallback_created, fallback_modified = None, None
+                        video_sources[f"Propio/Otro 🎥 ({u_v})"] = None
 
-    def walk(node: Any):
-        nonlocal created_date, last_modified, fallback_created, fallback_modified
-        if id(node) in seen_nodes: return
-        seen_nodes.add(id(node))
-        if isinstance(node, dict):
-            if node.get("datePublished") and not fallback_created: 
-                fallback_created = node.get("datePublished")
-            if node.get("dateModified") and not fallback_modified: 
-                fallback_modified = node.get("dateModified")
-            if "LiveBlogPosting" in str(node.get("@type", "")):
-                created_date = node.get("datePublished")
-                last_modified = node.get("dateModified")
-                updates = node.get("liveBlogUpdate", [])
-                if isinstance(updates, dict): updates = [updates]
-                for up in updates:
-                    if isinstance(up, dict):
-                        d = up.get("datePublished") or up.get("dateModified")
-                        if d: update_dates.append(d)
-            for v in node.values(): walk(v)
-        elif isinstance(node, list):
-            for it in node: walk(it)
+            stack_extend((v, k == "@graph") for k, v in reversed(node.items()) if _is(v, _containers))
+        elif _is(node, _list):
+            stack_extend((it, is_root) for it in reversed(node) if _is(it, _containers))
 
-    for b in blocks: walk(b)
-    freq = 0
-    if len(update_dates) > 1:
-        try:
-            p_up = [datetime.fromisoformat(re.search(r'\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}', d).group(0)) for d in update_dates if re.search(r'\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}', d)]
-            if len(p_up) > 1:
-                p_up.sort()
-                deltas = [(p_up[i] - p_up[i-1]).total_seconds() / 60 for i in range(1, len(p_up))]
-                freq = round(sum(deltas) / len(deltas), 1)
-        except: pass
     return {
+        "Type": ", ".join(mains),
+        # Flags por fila para métricas y filtros (mismo criterio que buscar el texto en "Type")
+        "_is_news": any("NewsArticle" in t for t in mains),
+        "_is_article": any("Article" in t for t in mains),
+        "_is_liveblog": any("LiveBlogPosting" in t for t in mains),
+        "Subtype": ", ".join(subs),
+        "autor": auth_name,
+        "firmado": has_auth,
         "creado": parse_date(created_date or fallback_created),
         "ultima_act": parse_date(last_modified or fallback_modified),
-        "lb_freq": freq,
-        "n_updates": len(update_dates)
+        "lb_freq": liveblog_frequency(update_dates),
+        "n_updates": len(update_dates),
+        "primaryImageOfPage": primary_image or "❌",
+        "mainEntityImage": "\n".join(main_images) if main_images else "❌",
+        "ogImage": str(meta_tags.get("og_image", "❌")),
+        "url_video": "\n".join(video_sources) if video_sources else "❌ No detectado",
     }
 
-def extract_hierarchical_types(blocks: List[Any], current_url: str) -> Tuple[List[str], List[str], Dict[str, Any], bool, str]:
-    mains, subs, seen_nodes = [], [], set()
-    dates = {"pub": None, "mod": None}
-    has_auth, auth_name = False, "No identificado"
-    site_domain_name = ""
-    try:
-        domain = urlparse(current_url).netloc
-        site_domain_name = domain.split('.')[-2].lower()
-    except: pass
-
-    def get_auth_info(data):
-        if isinstance(data, dict): return data.get("name"), data.get("@type")
-        if isinstance(data, list) and len(data) > 0: return get_auth_info(data[0])
-        return None, None
-
-    def walk(node: Any, is_root: bool):
-        if id(node) in seen_nodes: return
-        seen_nodes.add(id(node))
-        nonlocal has_auth, auth_name
-        if isinstance(node, dict):
-            t = node.get("@type", "")
-            curr = [t] if isinstance(t, str) else [str(x) for x in t]
-            if is_root: mains.extend(curr)
-            else: subs.extend(curr)
-            if any(at in curr for at in ["Article", "NewsArticle", "BlogPosting", "LiveBlogPosting"]):
-                if "author" in node and node["author"]:
-                    name, a_type = get_auth_info(node["author"])
-                    if name:
-                        auth_name = name
-                        name_lower = str(name).lower()
-                        is_person = (a_type == "Person")
-                        is_not_site_name = site_domain_name not in name_lower if site_domain_name else True
-                        has_auth = True if (is_person and is_not_site_name) else False
-            if node.get("datePublished") and not dates["pub"]: dates["pub"] = node.get("datePublished")
-            if node.get("dateModified") and not dates["mod"]: dates["mod"] = node.get("dateModified")
-            for k, v in node.items():
-                if k == "@graph": walk(v, True)
-                else: walk(v, False)
-        elif isinstance(node, list):
-            for it in node: walk(it, is_root)
-
-    for b in blocks: walk(b, True)
-    return list(dict.fromkeys(mains)), list(dict.fromkeys(subs)), dates, has_auth, auth_name
-
 # --- MOTOR DE PROCESAMIENTO ---
 
-def process_single_url(url: str):
-    html, code, _, meta = fetch_html(str(url))
-    row = {"url": url, "status": code, "Type": "", "Subtype": "", "autor": "No identificado", "firmado": False, "creado": None, "ultima_act": None, "lb_freq": 0, "n_updates": 0, "primaryImageOfPage": "❌", "mainEntityImage": "❌", "ogImage": "❌", "url_video": "❌ No detectado"}
+# Valores por defecto de una fila (URL sin HTML o sin JSON-LD)
+EMPTY_ROW = {"Type": "", "Subtype": "", "autor": "No identificado", "firmado": False, "creado": None, "ultima_act": None, "lb_freq": 0, "n_updates": 0, "primaryImageOfPage": "❌", "mainEntityImage": "❌", "ogImage": "❌", "url_video": "❌ No detectado", "_is_news": False, "_is_article": False, "_is_liveblog": False}
+ROW_COLUMNS = ("url", "status", *EMPTY_ROW)
+FLAG_COLUMNS = ("firmado", "_is_news", "_is_article", "_is_liveblog")
+
+# Cubre un CSV completo con el máximo de filas por defecto (5000) y margen para una segunda planilla
+@st.cache_data(ttl=3600, max_entries=10000, show_spinner=False)
+def _analyze_url(url: str, full_scan: bool):
+    html, code, err, meta, encoding = fetch_html(str(url))
+    # Las excepciones no se cachean: un fallo de red, un 429 (rate limit) o un 5xx se reintentan en el próximo "Procesar"
+    if err is not None: raise ConnectionError(err, None)
+    if code == 429 or code >= 500: raise ConnectionError(f"HTTP {code}", code)
+    row = {"url": url, "status": code, **EMPTY_ROW}
     if html:
-        blocks, _ = parse_jsonld_from_html(html)
-        mains, subs, dates, has_auth, auth_name = extract_hierarchical_types(blocks, url)
-        lb_info = analyze_liveblog(blocks)
-        multi = analyze_multimedia(blocks, meta)
-        row.update({"Type": ", ".join(mains), "Subtype": ", ".join(subs), "autor": auth_name, "firmado": has_auth, **lb_info, **multi})
+        blocks, _ = parse_jsonld_from_html(html, encoding, full_scan)
+        row.update(analyze_blocks(blocks, url, meta))
     return row
 
+def process_single_url(url: str, full_scan: bool = True):
+    try:
+        return _analyze_url(url, full_scan)
+    except ConnectionError as e:
+        _, code = e.args  # status real del 429/5xx; None si no hubo respuesta
+        return {"url": url, "status": code, **EMPTY_ROW}
+
+def to_csv_bytes(df: pd.DataFrame) -> bytes:
+    # Escritor CSV de Arrow (C++, multihilo) en vez del de pandas
+    buf = io.BytesIO()
+    pacsv.write_csv(pa.Table.from_pandas(df, preserve_index=False), buf)
+    return buf.getvalue()
+
 # --- INTERFAZ ---
 
 with st.sidebar:
@@ -212,6 +334,8 @@ with st.sidebar:
     url_col = st.text_input("Columna URL", value="url")
     max_rows = st.number_input("Máx. filas", min_value=1, value=5000)
     remove_dupes = st.checkbox("Quitar URLs duplicadas", value=True)
+    max_workers = st.slider("Descargas en paralelo", min_value=1, max_value=32, value=MAX_THREADS)
+    full_scan = st.checkbox("Escaneo completo de JSON-LD", value=True, help="Desactivalo para cortar en el primer bloque Article/LiveBlog (más rápido, puede omitir videos o tipos de bloques posteriores).")
 
 uploaded = st.file_uploader("Subí tu CSV", type=["csv"])
 
@@ -233,43 +357,60 @@ if uploaded is not None:
             st.stop()
 
         df_subset = df.head(int(max_rows))
-        urls_to_process = df_subset[url_col].tolist()
+        urls_to_process = df_subset[url_col].astype(str).str.strip().tolist()
+        unique_urls = list(dict.fromkeys(urls_to_process))  # cada URL se descarga una sola vez
 
         if st.button(f"🚀 Procesar {len(urls_to_process)} URLs"):
-            results = []
+            by_url = {}
             progress_bar = st.progress(0)
             status_text = st.empty()
             
-            with ThreadPoolExecutor(max_workers=MAX_THREADS) as executor:
-                future_to_url = {executor.submit(process_single_url, url): url for url in urls_to_process}
-                for i, future in enumerate(as_completed(future_to_url)):
-                    results.append(future.result())
-                    if i % 10 == 0 or i == len(urls_to_process) - 1:
-                        progress_bar.progress((i + 1) / len(urls_to_process))
-                        status_text.text(f"Procesadas: {i+1} / {len(urls_to_process)}")
-
-            out = pd.DataFrame(results)
+            total = len(unique_urls)
+            step = max(1, total // PROGRESS_STEPS)
+            last_update, last_done = 0.0, 0
+            with ThreadPoolExecutor(max_workers=int(max_workers)) as executor:
+                future_to_url = {executor.submit(process_single_url, url, full_scan): url for url in unique_urls}
+                for done, future in enumerate(as_completed(future_to_url), start=1):
+                    by_url[future_to_url[future]] = future.result()
+                    now = time.monotonic()
+                    # Tope por filas y por tiempo: a lo sumo ~PROGRESS_STEPS repintados en toda la corrida
+                    if done == total or (done - last_done >= step and now - last_update >= PROGRESS_INTERVAL):
+                        progress_bar.progress(done / total)
+                        status_text.text(f"Procesadas: {done} / {total}")
+                        last_update, last_done = now, done
+            results = [by_url[url] for url in urls_to_process]
+
+            # Construcción columnar: una lista por columna en vez de inferir desde dicts por fila
+            columns = {col: [row[col] for row in results] for col in ROW_COLUMNS}
+            columns["status"] = pd.array(columns["status"], dtype="Int32")
+            for col in FLAG_COLUMNS:
+                columns[col] = np.array(columns[col], dtype=bool)
+            # Todo el DataFrame respaldado por Arrow: filtros vectorizados y exportación CSV sin conversión
+            out = pd.DataFrame(columns).convert_dtypes(dtype_backend="pyarrow", convert_integer=False)
 
             c1, c2, c3, c4 = st.columns(4)
-            pct = lambda s: round((s.mean() * 100), 1) if not s.empty else 0
-            c1.metric("% NewsArticle", f"{pct(out['Type'].str.contains('NewsArticle', na=False))}%")
-            c2.metric("% Firmado", f"{pct(out['firmado'])}%")
-            c3.metric("% Video", f"{pct(out['url_video'] != '❌ No detectado')}%")
-            c4.metric("% LiveBlog", f"{pct(out['Type'].str.contains('LiveBlogPosting', na=False))}%")
+            # Matriz booleana (filas x métricas) y una sola reducción vectorizada
+            has_video = np.array(columns["url_video"], dtype=object) != "❌ No detectado"
+            hits = np.column_stack((columns["_is_news"], columns["firmado"], has_video, columns["_is_liveblog"]))
+            news_pct, signed_pct, video_pct, lb_pct = (hits.mean(axis=0) * 100).round(1) if len(results) else (0, 0, 0, 0)
+            c1.metric("% NewsArticle", f"{news_pct}%")
+            c2.metric("% Firmado", f"{signed_pct}%")
+            c3.metric("% Video", f"{video_pct}%")
+            c4.metric("% LiveBlog", f"{lb_pct}%")
 
             t1, t2, t3 = st.tabs(["📋 General", "⏱️ Freshness & Live Update", "🎬 Multimedia"])
             with t1:
                 st.dataframe(out[["url", "status", "Type", "autor", "firmado"]], use_container_width=True, hide_index=True)
-                st.download_button("Descargar CSV", data=out.to_csv(index=False).encode("utf-8"), file_name="analisis_schema.csv")
+                st.download_button("Descargar CSV", data=to_csv_bytes(out.drop(columns=["_is_news", "_is_article", "_is_liveblog"])), file_name="analisis_schema.csv")
             with t2:
                 col_news, col_lb = st.columns(2)
                 with col_news:
                     st.markdown("**📰 Fechas NewsArticle / Article**")
-                    n_df = out[out["Type"].str.contains("NewsArticle|Article", na=False)][["url", "creado", "ultima_act"]]
+                    n_df = out[out["_is_article"]][["url", "creado", "ultima_act"]]
                     st.dataframe(n_df.rename(columns={"ultima_act": "última actualización"}), use_container_width=True, hide_index=True)
                 with col_lb:
                     st.markdown("**🔴 LiveBlog: Frecuencia y Fechas**")
-                    l_df = out[out["Type"].str.contains("LiveBlogPosting", na=False)][["url", "lb_freq", "n_updates"]]
+                    l_df = out[out["_is_liveblog"]][["url", "lb_freq", "n_updates"]]
                     st.dataframe(l_df.rename(columns={"lb_freq": "Frec. Prom (Min)", "n_updates": "número de actualizaciones"}), use_container_width=True, hide_index=True)
             with t3:
                 st.subheader("URLs de Elementos Multimedia (Discover Audit)")